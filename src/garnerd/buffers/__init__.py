@@ -1,2 +1,2 @@
-from .shmem import SHMBufferSync, SHMFanoutBuffer
+from .shmem import DevShmMemory, SHMBarrier, SHMBufferSync, SHMFanoutBuffer
 from .processors import SHMProcessor, FileMagicProcessor, FileReadingProcessor, FileWritingProcessor
@@ -1,10 +1,11 @@
 from typing import Callable, Optional, BinaryIO, Self, Iterator, Iterable
 from pathlib import Path
 from magic import from_buffer
+from traceback import clear_frames
+import os
 
 from ..exceptions import SharedMemoryError
-
-from . import SHMBufferSync, SharedMemoryError
+from .shmem import SHMBufferSync
 
 
 class SHMProcessor:
@@ -101,19 +102,30 @@ class SHMProcessor:
             return {'error': 'pre_process failed'}
         
         bsiter = self.cycle_syncs()
+        error = None
         for bsync in bsiter:
-            bsync.wait()
+            bsync.acquire_read()
             buff = bsync.shmbuffer
             buff.load_size()
             datalen = len(buff)
             
-            self.handle_data(buff.buf[:datalen])
+            # after an error keep releasing buffers until the end of the stream so the producer isn't left waiting
+            if error is None:
+                try:
+                    self.handle_data(buff.buf[:datalen])
+                except Exception as e:
+                    # locals in the traceback reference the data view, which would keep the buffer from closing
+                    clear_frames(e.__traceback__)
+                    error = e
+            bsync.release_read()
             
             self.bytes_processed += datalen
             if datalen < buff.size or datalen == 0:
                 break
         
         self.post_process()
+        if error is not None:
+            raise error
         return self.report()
 
 
@@ -211,16 +223,44 @@ class FileReadingProcessor(SHMProcessor):
             return {'error': 'pre_process failed'}
         
         bsiter = self.cycle_syncs()
-        with open(self.file_path, 'rb', buffering=0) as f:
-            for bsync in bsiter:
-                buff = bsync.shmbuffer
-                n = f.readinto(buff.buf) or 0
-                self.bytes_processed += n
-                buff.save_size(n)
-                bsync.wait()
-                if n < buff.size:
-                    break
-        
-        self.post_process()
+        bsync = next(bsiter)
+        acquired = False
+        try:
+            with open(self.file_path, 'rb', buffering=0) as f:
+                if hasattr(os, 'posix_fadvise'):
+                    os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+                while True:
+                    buff = bsync.shmbuffer
+                    bsync.acquire_write()
+                    acquired = True
+                    n = buff.readinto_from(f)
+                    self.bytes_processed += n
+                    bsync.publish()
+                    acquired = False
+                    if n < buff.size:
+                        break
+                    bsync = next(bsiter)
+        except BaseException as e:
+            # locals in the traceback reference buffer views, which would keep the buffers from closing
+            clear_frames(e.__traceback__)
+            self.end_stream(bsync, acquired)
+            raise
+        finally:
+            self.post_process()
         return self.report()
     
+    def end_stream(self, bsync: SHMBufferSync, acquired: bool):
+        """publishes an empty buffer after a failure so consumers stop waiting for more data
+
+        Args:
+            bsync (SHMBufferSync): the buffer consumers are waiting on next
+            acquired (bool): the buffer was already acquired for writing
+        """
+        try:
+            if not acquired:
+                bsync.acquire_write()
+            bsync.shmbuffer.save_size(0)
+            bsync.publish()
+        except Exception:
+            pass
+    
@@ -1,14 +1,427 @@
 from typing import Callable, Optional, BinaryIO, Self
 from multiprocessing.shared_memory import SharedMemory
-from threading import Barrier
-from struct import calcsize, pack_into, unpack_from
+from multiprocessing import resource_tracker
+from threading import Barrier, BrokenBarrierError
+from struct import calcsize
 from collections.abc import Buffer
+from ctypes.util import find_library
+from time import time
+from os import strerror
+from mmap import mmap
+from secrets import token_hex
+import os
+from errno import EINTR, ETIMEDOUT
+import ctypes
+import sys
+
+from ..exceptions import SharedMemoryError
+
+
+try:
+    _libc = ctypes.CDLL(find_library('c'), use_errno=True)
+    _libc.sem_init, _libc.sem_destroy, _libc.sem_wait, _libc.sem_timedwait, _libc.sem_post
+except (OSError, AttributeError):
+    _libc = None
+
+
+class _Timespec(ctypes.Structure):
+    _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+
+
+class DevShmMemory:
+    """Shared memory backed directly by a file in /dev/shm (tmpfs). Same interface as SharedMemory.
+        The file is sized with ftruncate and mapped without touching any pages.
+        Only the creator registers the segment with the resource tracker, so it is removed if the creator dies
+        without unlinking, while attaching processes never unlink or warn about a buffer they don't own.
+        Names are interchangeable with SharedMemory names on Linux.
+    """
+    SHM_DIR = "/dev/shm"
+    _name: str
+    _tracked: bool
+    _mmap: mmap
+    _buf: memoryview|None
+    _size: int
+    
+    def __init__(self, name: str|None = None, create: bool = False, size: int = 0):
+        self._tracked = False
+        if create:
+            if size <= 0:
+                raise ValueError("'size' must be a positive number different from zero")
+            while True:
+                self._name = name or f"gd_{token_hex(8)}"
+                try:
+                    fd = os.open(self._path, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o600)
+                except FileExistsError:
+                    if name is not None:
+                        raise
+                    continue
+                break
+            try:
+                os.ftruncate(fd, size)
+            except OSError:
+                os.close(fd)
+                os.unlink(self._path)
+                raise
+            # same registration as SharedMemory. the tracker calls shm_unlink, which resolves to /dev/shm
+            resource_tracker.register(self._tracker_name, "shared_memory")
+            self._tracked = True
+        else:
+            if name is None:
+                raise ValueError("'name' can only be None if create=True")
+            self._name = name
+            fd = os.open(self._path, os.O_RDWR)
+        try:
+            self._size = os.fstat(fd).st_size
+            self._mmap = mmap(fd, self._size)
+        finally:
+            os.close(fd)
+        self._buf = memoryview(self._mmap)
+    
+    @staticmethod
+    def available() -> bool:
+        """
+        Returns:
+            bool: True if /dev/shm can be used on this platform
+        """
+        return sys.platform.startswith('linux') and os.path.isdir(DevShmMemory.SHM_DIR)
+    
+    @property
+    def _path(self) -> str:
+        return os.path.join(self.SHM_DIR, self._name.lstrip('/'))
+    
+    @property
+    def _tracker_name(self) -> str:
+        return "/" + self._name.lstrip('/')
+    
+    @property
+    def name(self) -> str:
+        return self._name
+    
+    @property
+    def size(self) -> int:
+        return self._size
+    
+    @property
+    def buf(self) -> memoryview:
+        return self._buf
+    
+    def close(self):
+        if self._buf is not None:
+            self._buf.release()
+            self._buf = None
+            self._mmap.close()
+    
+    def unlink(self):
+        try:
+            os.unlink(self._path)
+        except FileNotFoundError:
+            pass
+        if self._tracked:
+            resource_tracker.unregister(self._tracker_name, "shared_memory")
+            self._tracked = False
+
+
+class SHMBarrier:
+    """Reusable barrier for processes. State is kept in shared memory and waiting is done on
+        process-shared POSIX semaphores, so no manager process is involved.
+        With more than TREE_THRESHOLD parties, arrivals are combined up a binary tree and released
+        back down it instead of all parties contending on the central counter.
+        
+        Also provides a one producer / (parties - 1) consumer handoff for a single buffer
+        (wait_released, publish, wait_ready, release) so the producer only waits for consumers
+        to finish with a buffer before refilling it, instead of every party meeting at a barrier.
+        Each party must use its own instance for the handoff, e.g. one per process.
+    """
+    TREE_THRESHOLD = 8
+    _SEM_SLOT = 64
+    # mutex, gate 0, gate 1, ready 0, ready 1, done
+    _FIXED_SEMS = 6
+    _READY = 3
+    _DONE = 5
+    _CTL_OFFSET = _FIXED_SEMS * _SEM_SLOT
+    _TREE_OFFSET = _CTL_OFFSET + _SEM_SLOT
+    _shmem: SharedMemory|None
+    _sems: list[ctypes.Array]
+    _ctl: memoryview|None
+    _slot: int|None
+    _round: int
+    _created: bool
+    _unlinked: bool
+    _closed: bool
+    timeout: float|None
+    
+    def __init__(
+                self,
+                parties: int = 0,
+                name: str|None = None,
+                create: bool = False,
+                timeout: float|None = None,
+                buf: memoryview|None = None
+            ):
+        """
+        Args:
+            parties (int, optional): number of processes that must call wait. Required when creating. Defaults to 0.
+            name (str | None, optional): name of the shared memory to attach to. Defaults to None.
+            create (bool, optional): create and initialize a new barrier. Defaults to False.
+            timeout (float | None, optional): default timeout when waiting. Defaults to None.
+            buf (memoryview | None, optional): place the barrier in this region of an existing shared memory
+                instead of its own. must be at least region_size(parties) bytes. Defaults to None.
+
+        Raises:
+            ValueError: parties is less than 1 when creating or buf is too small
+            SharedMemoryError: process-shared semaphores are not supported
+        """
+        if not self.supported():
+            raise SharedMemoryError("Process-shared semaphores are not supported on this platform")
+        if create and parties < 1:
+            raise ValueError("parties must be integer >= 1")
+        self._ctl = None
+        self._sems = list()
+        self._slot = None
+        self._round = 0
+        self._shmem = None
+        self._created = create
+        self._unlinked = True
+        self._closed = True
+        self.timeout = timeout
+        if buf is None:
+            self._shmem = SharedMemory(name=name, create=create, size=self.region_size(parties))
+            buf = self._shmem.buf
+        elif create and len(buf) < self.region_size(parties):
+            raise ValueError(f"buf is too small for a barrier with {parties} parties")
+        self._unlinked = False
+        self._closed = False
+        self._ctl = buf[self._CTL_OFFSET:self._CTL_OFFSET + 32].cast('Q')
+        if create:
+            self._ctl[0] = parties
+            self._ctl[1] = 0
+            self._ctl[2] = 0
+            self._ctl[3] = 0
+        sem_count = self._FIXED_SEMS
+        if self._ctl[0] > self.TREE_THRESHOLD:
+            sem_count += 2 * self._ctl[0]
+        self._sems = [(ctypes.c_char * self._SEM_SLOT).from_buffer(buf, self._sem_offset(i)) for i in range(sem_count)]
+        if create:
+            for i in range(len(self._sems)):
+                # mutex starts unlocked and the buffer starts released by every consumer
+                value = 0
+                if i == 0:
+                    value = 1
+                elif i == self._DONE:
+                    value = parties - 1
+                if _libc.sem_init(self._sems[i], 1, value) != 0:
+                    err = ctypes.get_errno()
+                    self.close()
+                    self.unlink()
+                    raise SharedMemoryError(f"sem_init failed: {strerror(err)}")
+    
+    @classmethod
+    def region_size(cls, parties: int) -> int:
+        """
+        Args:
+            parties (int): number of processes using the barrier
+
+        Returns:
+            int: bytes of shared memory required by a barrier
+        """
+        # layout: mutex, gate 0, gate 1, ready 0, ready 1, done, then parties / count / generation / next slot as uint64.
+        # tree barriers follow with an arrive and a go semaphore per party.
+        # every semaphore gets its own cache line
+        size = cls._TREE_OFFSET
+        if parties > cls.TREE_THRESHOLD:
+            size += 2 * parties * cls._SEM_SLOT
+        return size
+    
+    def _sem_offset(self, idx: int) -> int:
+        if idx < self._FIXED_SEMS:
+            return idx * self._SEM_SLOT
+        return self._TREE_OFFSET + (idx - self._FIXED_SEMS) * self._SEM_SLOT
+    
+    @staticmethod
+    def supported() -> bool:
+        """
+        Returns:
+            bool: True if process-shared semaphores can be used on this platform
+        """
+        return _libc is not None and sys.platform.startswith('linux')
+    
+    @property
+    def name(self) -> str|None:
+        """
+        Returns:
+            str|None: name of the underlying shared memory. None if the barrier is placed in a region of another buffer
+        """
+        if self._shmem is None:
+            return None
+        return self._shmem.name
+    
+    @property
+    def parties(self) -> int:
+        """
+        Returns:
+            int: number of processes required to pass the barrier
+        """
+        return self._ctl[0]
+    
+    def _sem_wait(self, idx: int, timeout: float|None):
+        # semaphores are referenced by index. holding one in a local would keep the
+        # shared memory exported (and unclosable) while a traceback references this frame
+        if timeout is None:
+            while _libc.sem_wait(self._sems[idx]) != 0:
+                err = ctypes.get_errno()
+                if err != EINTR:
+                    raise OSError(err, strerror(err))
+            return
+        deadline = time() + timeout
+        ts = _Timespec(int(deadline), int((deadline % 1) * 1e9))
+        while _libc.sem_timedwait(self._sems[idx], ctypes.byref(ts)) != 0:
+            err = ctypes.get_errno()
+            if err == ETIMEDOUT:
+                raise BrokenBarrierError()
+            if err != EINTR:
+                raise OSError(err, strerror(err))
+    
+    def wait(self, timeout: float|None = None) -> int:
+        """Wait until all parties have called wait.
+            Tree barriers require each party to use its own SHMBarrier instance, e.g. one per process.
+        
+        Args:
+            timeout (float | None, optional): seconds to wait. Defaults to None which uses the default timeout.
+
+        Raises:
+            BrokenBarrierError: timed out waiting
+
+        Returns:
+            int: arrival index, 0 to parties - 1. for tree barriers, the slot of this instance in the tree.
+        """
+        timeout = timeout or self.timeout
+        if self._ctl[0] > self.TREE_THRESHOLD:
+            return self._tree_wait(timeout)
+        ctl = self._ctl
+        self._sem_wait(0, timeout)
+        generation = ctl[2]
+        index = ctl[1]
+        ctl[1] = index + 1
+        # gates alternate by generation so a fast process entering the next round
+        # can never take a wake up meant for the current one
+        gate = 1 + (generation % 2)
+        if index + 1 == ctl[0]:
+            ctl[1] = 0
+            ctl[2] = generation + 1
+            for _ in range(ctl[0] - 1):
+                _libc.sem_post(self._sems[gate])
+            _libc.sem_post(self._sems[0])
+        else:
+            _libc.sem_post(self._sems[0])
+            self._sem_wait(gate, timeout)
+        return index
+    
+    def _claim_slot(self, timeout: float|None) -> int:
+        if self._slot is None:
+            self._sem_wait(0, timeout)
+            slot = self._ctl[3]
+            self._ctl[3] = slot + 1
+            _libc.sem_post(self._sems[0])
+            if slot >= self._ctl[0]:
+                raise SharedMemoryError("More SHMBarrier instances waiting than parties")
+            self._slot = slot
+        return self._slot
+    
+    def _tree_wait(self, timeout: float|None) -> int:
+        # node i: arrive semaphore at base + 2i, go semaphore at base + 2i + 1. children are 2i+1 and 2i+2
+        base = self._FIXED_SEMS
+        parties = self._ctl[0]
+        slot = self._claim_slot(timeout)
+        children = [c for c in (2 * slot + 1, 2 * slot + 2) if c < parties]
+        for _ in children:
+            self._sem_wait(base + 2 * slot, timeout)
+        if slot != 0:
+            _libc.sem_post(self._sems[base + 2 * ((slot - 1) // 2)])
+            self._sem_wait(base + 2 * slot + 1, timeout)
+        for c in children:
+            _libc.sem_post(self._sems[base + 2 * c + 1])
+        return slot
+    
+    def wait_released(self, timeout: float|None = None):
+        """Producer: wait until every consumer has released the buffer since it was last published
+
+        Args:
+            timeout (float | None, optional): seconds to wait. Defaults to None which uses the default timeout.
+
+        Raises:
+            BrokenBarrierError: timed out waiting
+        """
+        timeout = timeout or self.timeout
+        for _ in range(self._ctl[0] - 1):
+            self._sem_wait(self._DONE, timeout)
+    
+    def publish(self):
+        """Producer: signal every consumer that the buffer has been filled
+        """
+        # ready semaphores alternate by round. consumers of the same buffer are never more than one
+        # round apart, so a consumer that is ahead can't take a token meant for one that is behind
+        ready = self._READY + (self._round % 2)
+        self._round += 1
+        for _ in range(self._ctl[0] - 1):
+            _libc.sem_post(self._sems[ready])
+    
+    def wait_ready(self, timeout: float|None = None):
+        """Consumer: wait until the producer has published the buffer
+
+        Args:
+            timeout (float | None, optional): seconds to wait. Defaults to None which uses the default timeout.
+
+        Raises:
+            BrokenBarrierError: timed out waiting
+        """
+        ready = self._READY + (self._round % 2)
+        self._sem_wait(ready, timeout or self.timeout)
+        self._round += 1
+    
+    def release(self):
+        """Consumer: signal the producer that this consumer is finished with the buffer
+        """
+        _libc.sem_post(self._sems[self._DONE])
+    
+    def close(self):
+        """calls close on the shared memory. required for all when no longer in use.
+        """
+        if not self._closed:
+            if self._ctl is not None:
+                self._ctl.release()
+                self._ctl = None
+            self._sems.clear()
+            if self._shmem is not None:
+                self._shmem.close()
+            self._closed = True
+    
+    def unlink(self):
+        """destroys the semaphores and calls unlink on the shared memory. required for creator.
+        """
+        if not self._unlinked and self._created:
+            for i in range(len(self._sems)):
+                _libc.sem_destroy(self._sems[i])
+            self.close()
+            if self._shmem is not None:
+                self._shmem.unlink()
+            self._unlinked = True
+    
+    def __reduce__(self):
+        if self._shmem is None:
+            raise TypeError("SHMBarrier placed in another buffer can't be pickled. attach to that buffer instead")
+        # slots are claimed per instance, so a copy always starts without one
+        return (self.__class__, (0, self.name, False, self.timeout))
+    
+    def __del__(self):
+        self.close()
+        self.unlink()
 
 
 class SHMFanoutBuffer:
-    """Uses a shared memory buffer for backing
+    """Uses a shared memory buffer for backing.
+        layout: control block length, control block (barrier state), data size, data
     """
-    _shmem: SharedMemory
+    _shmem: SharedMemory|DevShmMemory
     _max: int
     _created: bool
     _sz_struct: str
@@ -17,23 +430,55 @@ class SHMFanoutBuffer:
     _closed: bool
     _size: int
     _mv: memoryview
+    _size_mv_q: memoryview
+    _hdr_mv_q: memoryview
+    _ctl_mv: memoryview|None
+    _barrier: SHMBarrier|None
     
     def __init__(
                 self,
                 size: int = (256 * 1024 * 1024), 
                 name: str|None = None,
-                create: bool = False
+                create: bool = False,
+                max_parties: int = 0,
+                fast_shm: bool = True
             ):
+        """
+        Args:
+            size (int, optional): bytes available for data. Defaults to 256M (256 * 1024 * 1024).
+            name (str | None, optional): name of the shared memory to attach to. Defaults to None.
+            create (bool, optional): create new shared memory. Defaults to False.
+            max_parties (int, optional): reserve a control block for a barrier with up to this many parties.
+                Ignored if process-shared semaphores are not supported. Defaults to 0 (no barrier).
+            fast_shm (bool, optional): use DevShmMemory when /dev/shm is available instead of SharedMemory.
+                Defaults to True.
+        """
+        self._barrier = None
         self._sz_struct = "Q"
         self._sz_width = calcsize(self._sz_struct)
-        min_size = size + self._sz_width
-        self._shmem = SharedMemory(name=name, create=create, size=min_size)
-        self._max = self._shmem.size - self._sz_width
+        ctl_len = 0
+        if create and max_parties > 0 and SHMBarrier.supported():
+            ctl_len = SHMBarrier.region_size(max_parties)
+        min_size = size + ctl_len + (2 * self._sz_width)
+        if fast_shm and DevShmMemory.available():
+            self._shmem = DevShmMemory(name=name, create=create, size=min_size)
+        else:
+            self._shmem = SharedMemory(name=name, create=create, size=min_size)
+        self._hdr_mv_q = self._shmem.buf[:self._sz_width].cast(self._sz_struct)
+        if create:
+            self._hdr_mv_q[0] = ctl_len
+        else:
+            ctl_len = self._hdr_mv_q[0]
+        size_offset = self._sz_width + ctl_len
+        data_offset = size_offset + self._sz_width
+        self._ctl_mv = self._shmem.buf[self._sz_width:size_offset] if ctl_len else None
+        self._max = self._shmem.size - data_offset
         self._created = create
         self._unlinked = False
         self._closed = False
         self._size = 0
-        self._mv = self._shmem.buf[self._sz_width:]
+        self._mv = self._shmem.buf[data_offset:]
+        self._size_mv_q = self._shmem.buf[size_offset:data_offset].cast(self._sz_struct)
     
     @property
     def name(self) -> str:
@@ -43,17 +488,48 @@ class SHMFanoutBuffer:
         """
         return self._shmem.name
     
+    @property
+    def barrier(self) -> SHMBarrier|None:
+        """
+        Returns:
+            SHMBarrier|None: barrier kept in this buffer's control block. None if there is no control block
+        """
+        if self._barrier is None and self._ctl_mv is not None:
+            self._barrier = SHMBarrier(buf=self._ctl_mv)
+        return self._barrier
+    
+    def reset_barrier(self, parties: int, timeout: float|None = None) -> SHMBarrier:
+        """(Re)initializes the barrier in the control block. Must not be called while any process is waiting on it.
+
+        Args:
+            parties (int): number of processes that must call wait
+            timeout (float | None, optional): default timeout when waiting. Defaults to None.
+
+        Raises:
+            SharedMemoryError: buffer was created without a control block
+
+        Returns:
+            SHMBarrier: the initialized barrier
+        """
+        if self._ctl_mv is None:
+            raise SharedMemoryError(f"Shared Memory Buffer {self.name} has no barrier control block")
+        if self._barrier is not None:
+            self._barrier.unlink()
+            self._barrier.close()
+        self._barrier = SHMBarrier(parties=parties, create=True, timeout=timeout, buf=self._ctl_mv)
+        return self._barrier
+    
     def save_size(self, new_size: int = None):
         """writes size to size struct at beginning of buffer
         """
         if new_size is not None:
             self._size = new_size
-        pack_into(self._sz_struct, self._shmem.buf, 0, self._size)
+        self._size_mv_q[0] = self._size
         
     def load_size(self):
         """loads size from size struct at beginning of buffer
         """
-        self._size = unpack_from(self._sz_struct, self._shmem.buf, 0)[0]
+        self._size = self._size_mv_q[0]
     
     def save_bytes(self, data: Buffer) -> int:
         """Writes data to the buffer
@@ -64,12 +540,37 @@ class SHMFanoutBuffer:
         Returns:
             int: number of bytes put into buffer. can be truncated if data is larger than buffer
         """
+        if not isinstance(data, bytes):
+            data = memoryview(data).cast('B')
         addlen = min(len(data), self._max)
-        self._shmem.buf[self._sz_width:addlen] = data[:addlen]
+        self._mv[:addlen] = data if addlen == len(data) else data[:addlen]
         self._size = addlen
-        self.save_size()
+        self._size_mv_q[0] = addlen
         return addlen
     
+    def readinto_from(self, fileobj: BinaryIO, maxbytes: int|None = None) -> int:
+        """Reads from a file directly into the buffer and saves the size. Avoids copying through an intermediate bytes object.
+            Short reads are retried so the buffer is only partially filled at end of file.
+
+        Args:
+            fileobj (BinaryIO): binary file object supporting readinto
+            maxbytes (int | None, optional): max bytes to read. Defaults to None which fills the buffer.
+
+        Returns:
+            int: number of bytes put into buffer
+        """
+        limit = self._max if maxbytes is None else min(maxbytes, self._max)
+        mv = self._mv if limit == self._max else self._mv[:limit]
+        n = 0
+        while n < limit:
+            r = fileobj.readinto(mv[n:] if n else mv)
+            if not r:
+                break
+            n += r
+        self._size = n
+        self._size_mv_q[0] = n
+        return n
+    
     def load_bytes(self) -> memoryview:
         """Load size of data in buffer and return snapshot
 
@@ -84,13 +585,49 @@ class SHMFanoutBuffer:
         Returns:
             memoryview: read only snapshot of memory contents
         """
-        return self._shmem.buf[self._sz_width:self._size].toreadonly()
+        return self._mv[:self._size].toreadonly()
+    
+    def snapshot_into(self, out: Buffer) -> int:
+        """Copies the memory contents into a writable buffer owned by the caller
+
+        Args:
+            out (Buffer): writable buffer at least snapshot_len bytes long
+
+        Raises:
+            ValueError: out is smaller than the memory contents
+
+        Returns:
+            int: number of bytes copied
+        """
+        n = self._size
+        out = memoryview(out).cast('B')
+        if len(out) < n:
+            raise ValueError(f"output buffer must be at least {n} bytes")
+        out[:n] = self._mv[:n]
+        return n
+    
+    @property
+    def snapshot_len(self) -> int:
+        """
+        Returns:
+            int: number of bytes a snapshot would contain
+        """
+        return self._size
     
     def close(self):
         """calls close on the shared memory. required for all when no longer in use.
         """
         if not self._closed:
+            if self._barrier is not None:
+                if self._created:
+                    self._barrier.unlink()
+                self._barrier.close()
+                self._barrier = None
+            if self._ctl_mv is not None:
+                self._ctl_mv.release()
             self._mv.release()
+            self._size_mv_q.release()
+            self._hdr_mv_q.release()
             self._shmem.close()
             self._closed = True
             
@@ -143,16 +680,17 @@ class SHMFanoutBuffer:
 
 class SHMBufferSync:
     shm_name: str
-    barrier: Barrier|None
+    barrier: Barrier|SHMBarrier|None
     _buffer: SHMFanoutBuffer|None
     timeout: float|None
 
-    def __init__(self, shm_name: str, barrier: Barrier|None, timeout: float|None = None):
+    def __init__(self, shm_name: str, barrier: Barrier|SHMBarrier|None = None, timeout: float|None = None):
         """Multiprocessing sync object for handling fanout buffers.
 
         Args:
             shm_name (str): name of the buffer. this is used to load an already initialized shared memory
-            barrier (Barrier | None): barrier sync object associated with the buffer
+            barrier (Barrier | SHMBarrier | None, optional): barrier sync object associated with the buffer.
+                Defaults to None which uses the barrier in the buffer's control block.
             timeout (float | None, optional): default timeout when waiting on barrier. Defaults to None.
         """
         self.shm_name = shm_name
@@ -174,9 +712,50 @@ class SHMBufferSync:
     def shmbuffer(self) -> SHMFanoutBuffer:
         return self._buffer
     
+    def _buffer_barrier(self) -> SHMBarrier:
+        barrier = self._buffer.barrier
+        if barrier is None:
+            raise SharedMemoryError(f"No barrier available for Shared Memory Buffer {self.shm_name}")
+        return barrier
+    
     def wait(self, timeout: float|None = None):
+        """wait for all parties on the barrier
+        """
         timeout = timeout or self.timeout
-        self.barrier.wait(timeout=self.timeout)
+        barrier = self.barrier
+        if barrier is None:
+            barrier = self._buffer_barrier()
+        barrier.wait(timeout=timeout)
+    
+    def acquire_write(self, timeout: float|None = None):
+        """Producer: wait until the buffer can be refilled.
+            With an explicit barrier this is a no-op and publish waits on the barrier instead.
+        """
+        if self.barrier is None:
+            self._buffer_barrier().wait_released(timeout=timeout or self.timeout)
+    
+    def publish(self, timeout: float|None = None):
+        """Producer: hand a filled buffer to the consumers
+        """
+        if self.barrier is None:
+            self._buffer_barrier().publish()
+        else:
+            self.barrier.wait(timeout=timeout or self.timeout)
+    
+    def acquire_read(self, timeout: float|None = None):
+        """Consumer: wait until the buffer has been filled
+        """
+        if self.barrier is None:
+            self._buffer_barrier().wait_ready(timeout=timeout or self.timeout)
+        else:
+            self.barrier.wait(timeout=timeout or self.timeout)
+    
+    def release_read(self):
+        """Consumer: done with the buffer, it may be refilled.
+            With an explicit barrier this is a no-op.
+        """
+        if self.barrier is None:
+            self._buffer_barrier().release()
     
     def __hash__(self) -> int:
         return self.shm_name.__hash__()
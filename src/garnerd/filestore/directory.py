@@ -1,8 +1,21 @@
 from pathlib import Path
 from typing import Callable, Iterator
-from shutil import disk_usage, copy
-from filelock import FileLock, AsyncFileLock
-from os import walk, chmod
+from shutil import disk_usage, copyfile, copyfileobj
+from tempfile import mkstemp
+from threading import Lock
+from os import walk, makedirs, scandir, replace, getpid, link, close
+from os import open as os_open, O_RDWR, O_CREAT, O_WRONLY, O_EXCL
+from os.path import isdir
+from os import sep
+from itertools import product
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
 from garnerd.exceptions import InvalidDirectoryError, InvalidFileError, InvalidFileSize, InvalidPath
 
@@ -10,11 +23,50 @@ import asyncio
 import aiofiles.os
 
 
+@lru_cache(maxsize=4096)
 def size_to_basex(size: int, base_text="0123456789abcdefghijklmnopqrstuv") -> str:
     base = len(base_text)
     if size < base:
         return base_text[size]
-    return size_to_basex(size // base, base_text=base_text) + base_text[size % base]
+    digits = []
+    if base & (base - 1) == 0:
+        shift = base.bit_length() - 1
+        mask = base - 1
+        while size:
+            digits.append(base_text[size & mask])
+            size >>= shift
+    else:
+        while size:
+            size, r = divmod(size, base)
+            digits.append(base_text[r])
+    return ''.join(reversed(digits))
+
+
+def _check_path_key(path_key: str, dir_depth: int) -> str:
+    path_key = path_key.lower()
+    # strip leaves nothing behind only when every character is a hex digit
+    if not path_key or path_key.strip("0123456789abcdef"):
+        raise ValueError("path_key must be a hex string")
+    if len(path_key) <= dir_depth:
+        raise InvalidPath(f"path_key must be a string with a length greater than {dir_depth}.")
+    return path_key
+
+
+def _split_path_key(path_key: str, dir_depth: int) -> list[str]:
+    path_key = _check_path_key(path_key=path_key, dir_depth=dir_depth)
+    pieces = list(path_key[:dir_depth])
+    pieces.append(path_key[dir_depth:])
+    return pieces
+
+
+@lru_cache(maxsize=65536)
+def _store_path(prefix: Path|None, path_key: str, dir_depth: int, size_string: str) -> Path:
+    path_key = _check_path_key(path_key=path_key, dir_depth=dir_depth)
+    subpath = sep.join(path_key[:dir_depth])
+    fname = path_key[dir_depth:] + '.' + size_string
+    if prefix:
+        return prefix.joinpath(subpath, fname)
+    return Path(subpath, fname)
 
 
 class AsyncDummyLock:
@@ -26,11 +78,37 @@ class AsyncDummyLock:
         await asyncio.sleep(0)
         return self
 
-    async def __aexit__(self, exc_type, exc, tb):
+    async def __aexit__(self, exc, exc_val, tb):
         # No lock to release
         pass
 
 
+class AsyncLock:
+    """Asynchronous wrapper around a threading lock. Acquiring waits in a worker thread
+        so the event loop is not blocked.
+    """
+    
+    def __init__(self, lock: Lock):
+        self._lock = lock
+    
+    async def __aenter__(self):
+        acquiring = asyncio.ensure_future(asyncio.to_thread(self._lock.acquire))
+        try:
+            await asyncio.shield(acquiring)
+        except asyncio.CancelledError:
+            # the worker thread still takes the lock and __aexit__ won't run. release it once it does
+            acquiring.add_done_callback(self._release_acquired)
+            raise
+        return self
+    
+    def _release_acquired(self, acquiring: asyncio.Future):
+        if not acquiring.cancelled() and acquiring.exception() is None and acquiring.result():
+            self._lock.release()
+
+    async def __aexit__(self, exc, exc_val, tb):
+        self._lock.release()
+
+
 class DummyLock:
     def acquire(self, blocking=True, timeout=-1):
         # Always return True to simulate a successful acquisition
@@ -50,7 +128,8 @@ class DummyLock:
 
 class DirectoryFileStore:
     path: Path
-    lock_dir: Path
+    count_path: Path
+    count_lock_path: Path
     dir_depth: int
     max_files: int
     min_free: float
@@ -58,10 +137,17 @@ class DirectoryFileStore:
     max_file_size: int
     size_encoder: Callable[[int], str]
     use_file_lock: bool
+    use_count_cache: bool
+    use_exists_cache: bool
+    exists_cache_size: int
     initialized: bool
     dir_mode: int
     file_mode: int
     _stored: int
+    _locks = tuple(Lock() for _ in range(256))
+    _count_lock: Lock
+    _hard_links: bool
+    _exists: dict[Path,bool]
     hexchars = ['0','1','2','3','4','5','6','7','8','9','a','b','c','d','e','f']
     
     def __init__(
@@ -88,7 +174,8 @@ class DirectoryFileStore:
                 Defaults to size_to_basex.
         """
         self.path = Path(path)
-        self.lock_dir = self.path / ".locks"
+        self.count_path = self.path / ".garnerd_count"
+        self.count_lock_path = self.path / ".garnerd_count.lock"
         self.dir_depth = dir_depth
         self.max_files = max_files
         self.max_file_size = max_file_size
@@ -97,7 +184,13 @@ class DirectoryFileStore:
         self.dir_mode = 0o770
         self.file_mode = 0o660
         self._stored = 0
+        self._count_lock = Lock()
+        self._hard_links = True
         self.use_file_lock = True
+        self.use_count_cache = True
+        self.use_exists_cache = True
+        self.exists_cache_size = 100000
+        self._exists = {}
         
         if min_free >= 0 and min_free < 100:
             self.min_free = min_free
@@ -117,28 +210,47 @@ class DirectoryFileStore:
             bool: True if file exists
         """
         fpath = self.file_path(path_key=path_key, file_size=file_size)
-        return fpath.exists() and fpath.is_file()
+        if fpath in self._exists:
+            return True
+        found = fpath.is_file()
+        if found:
+            self._remember_exists(fpath)
+        return found
+    
+    def _remember_exists(self, fpath: Path):
+        """adds a stored file to the positive has_file cache, evicting the oldest entry when full.
+            only files removed through this store are invalidated.
+        """
+        if not self.use_exists_cache:
+            return
+        if len(self._exists) >= self.exists_cache_size:
+            try:
+                self._exists.pop(next(iter(self._exists)), None)
+            except (StopIteration, RuntimeError):
+                pass
+        self._exists[fpath] = True
     
-    def get_lock(self, file_path: str, is_async: bool = False) -> AsyncDummyLock|DummyLock|AsyncFileLock|FileLock:
+    def get_lock(self, file_path: str, is_async: bool = False) -> "AsyncDummyLock|DummyLock|AsyncLock|Lock":
         """Return a lock. If use_file_lock option is not set to True, returns dummy locks that don't do anything.
+            Locks are in-process, sharded by the hash of the file path and shared by all stores in the process.
+            Exclusion between processes is provided by the store operations themselves.
 
         Args:
-            file_path (str): file path to the lock
+            file_path (str): file path to lock
             is_async (bool, optional): create Async locks. Defaults to False.
 
         Returns:
-            AsyncDummyLock|DummyLock|AsyncFileLock|FileLock: Lock type depending on options
+            AsyncDummyLock|DummyLock|AsyncLock|Lock: Lock type depending on options
         """
         if not self.use_file_lock:
             if is_async:
                 return AsyncDummyLock()
             else:
                 return DummyLock()
-        else:
-            if is_async:
-                return AsyncFileLock(lock_file=file_path)
-            else:
-                return FileLock(lock_file=file_path)
+        lock = self._locks[hash(str(file_path)) & 0xFF]
+        if is_async:
+            return AsyncLock(lock)
+        return lock
     
     async def has_file_async(self, path_key: str, file_size: int):
         """asynchronously check if a file exists in a the store
@@ -151,7 +263,12 @@ class DirectoryFileStore:
             bool: True if file exists
         """
         fpath = self.file_path(path_key=path_key, file_size=file_size)
-        return await aiofiles.os.path.isfile(str(fpath))
+        if fpath in self._exists:
+            return True
+        found = await aiofiles.os.path.isfile(str(fpath))
+        if found:
+            self._remember_exists(fpath)
+        return found
     
     def path_list(self, path_key: str) -> list[str]:
         """breaks down a path key into pieces based on directory depth.
@@ -168,17 +285,7 @@ class DirectoryFileStore:
                 the last item will always be the file portion. all others are subdirectories.
                 example: path_key="abcdef1234", dir_depth=3 -> ["a","b","c","def1234"]
         """
-        try:
-            int(path_key, 16)
-        except ValueError:
-            raise ValueError("path_key must be a hex string")
-        
-        path_key = path_key.lower()
-        if len(path_key) <= self.dir_depth:
-            raise InvalidPath(f"path_key must be a string with a length greater than {self.dir_depth}.")
-        pieces = [path_key[a] for a in range(0,self.dir_depth)]
-        pieces.append(f"{path_key[self.dir_depth:]}")
-        return pieces
+        return _split_path_key(path_key=path_key, dir_depth=self.dir_depth)
     
     def size_to_string(self, file_size: int) -> str:
         """Converts the file's size into a string.
@@ -204,12 +311,7 @@ class DirectoryFileStore:
     
     def _store_file_path(self, path_key: str, file_size: int, prefix: Path|None = None) -> Path:
         size_string = self.size_to_string(file_size=file_size)
-        pieces = self.path_list(path_key=path_key)
-        fname = pieces.pop(-1)
-        fname = f"{fname}.{size_string}"
-        if prefix:
-            return prefix / Path(*pieces) / fname
-        return Path(*pieces) / fname
+        return _store_path(prefix, path_key, self.dir_depth, size_string)
     
     def file_path(self, path_key: str, file_size: int) -> Path:
         """generate a unique file path for this store
@@ -223,26 +325,16 @@ class DirectoryFileStore:
         """
         return self._store_file_path(path_key=path_key, file_size=file_size, prefix=self.path)
     
-    def lock_path(self, path_key: str, file_size: int) -> Path:
-        """generate a unique lock for this store
-
-        Args:
-            path_key (str): a unique identifier for a file. typically a hash
-            file_size (int): the size in bytes of the file
-
-        Returns:
-            Path: full path to a unique lock file
-        """
-        return self._store_file_path(path_key=path_key, file_size=file_size, prefix=self.lock_dir)
-    
     def init_store(self) -> tuple[int,int]:
-        """Creates all required store directories if needed and counts already stored files
+        """Creates all required store directories if needed and counts already stored files.
+            The count is loaded from the count cache file when available.
 
         Returns:
             tuple[int,int]: directories created, file stored
         """
         dcount = self.create_dirs()
-        self._stored = self.count_stored()
+        if not self.load_count():
+            self.rebuild_count()
         return dcount,self._stored
     
     async def init_store_async(self) -> tuple[int,int]:
@@ -252,37 +344,107 @@ class DirectoryFileStore:
             tuple[int,int]: directories created, file stored
         """
         dcount = await self.create_dirs_async()
-        self._stored = await self.count_stored_async()
+        if not await asyncio.to_thread(self.load_count):
+            await self.rebuild_count_async()
         return dcount,self._stored
     
+    def load_count(self) -> bool:
+        """Loads the number of stored files from the count cache file
+        
+        Returns:
+            bool: True if a valid count was loaded. False if caching is disabled or the file is missing or invalid.
+        """
+        if not self.use_count_cache:
+            return False
+        try:
+            with open(self.count_path, 'r') as f:
+                stored = int(f.read())
+        except (OSError, ValueError):
+            return False
+        if stored < 0:
+            return False
+        self._stored = stored
+        return True
+    
+    def save_count(self):
+        """Atomically writes the number of stored files to the count cache file.
+            Callers updating an existing count should hold count_file_lock.
+        """
+        if not self.use_count_cache:
+            return
+        tmp_path = self.count_path.with_name(f"{self.count_path.name}.{getpid()}.tmp")
+        with open(tmp_path, 'w') as f:
+            f.write(f"{self._stored}\n")
+        replace(tmp_path, self.count_path)
+    
+    @contextmanager
+    def count_file_lock(self):
+        """Holds the count lock for this process and, where fcntl is available, an exclusive
+            flock on the count lock file so stores in other processes sharing the path are excluded.
+        """
+        with self._count_lock:
+            if fcntl is None or not self.use_count_cache:
+                yield
+                return
+            fd = os_open(self.count_lock_path, O_RDWR | O_CREAT, self.file_mode)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                yield
+            finally:
+                # closing the descriptor releases the flock
+                close(fd)
+    
+    def rebuild_count(self) -> int:
+        """Recounts all stored files and updates the count cache file
+        
+        Returns:
+            int: files in store
+        """
+        with self.count_file_lock():
+            self._stored = self.count_stored()
+            self.save_count()
+        return self._stored
+    
+    async def rebuild_count_async(self) -> int:
+        return await asyncio.to_thread(self.rebuild_count)
+    
     def enum_sub_dirs(self, base_dir: str|Path = None, depth: int = 1, max_depth: int = None) -> Iterator[Path]:
         """Enumerates all bottom level directories used by the store
 
         Args:
             base_dir (str | Path, optional): where to start. Defaults to None which will use the store path.
-            depth (int, optional): recursion helper. incremented on recursive calls to prevent infinite recursion.
+            depth (int, optional): unused. kept for compatibility with the former recursive implementation.
                 Defaults to 1.
             max_depth (int, optional): max level depth. Defaults to None which will use the store's configured max depth.
+                a depth of 0 yields only the base directory.
 
         Raises:
-            ValueError: depth or max_depth is not valid integer.
+            ValueError: max_depth is not valid integer.
 
         Yields:
             Iterator[Path]: each bottom level path in the store. this will be (16 ** max_depth) items.
         """
-        if not isinstance(depth, int) or depth < 1:
-            raise ValueError("depth must be integer >= 1")
-        max_depth = max_depth or self.dir_depth
-        
-        pd = base_dir or self.path
-        pd: Path = Path(pd)
+        for d in self._leaf_dirs(base_dir=base_dir, max_depth=max_depth):
+            yield Path(d)
+    
+    def _leaf_dirs(self, base_dir: str|Path = None, max_depth: int = None) -> Iterator[str]:
+        """same as enum_sub_dirs but yields strings. used internally where paths are only passed to os functions.
+        """
+        if max_depth is None:
+            max_depth = self.dir_depth
+        if not isinstance(max_depth, int) or max_depth < 0:
+            raise ValueError("max_depth must be integer >= 0")
         
-        if depth > max_depth:
-            yield pd
-        else:
-            for hd in self.hexchars:
-                nd = pd / hd
-                yield from self.enum_sub_dirs(base_dir=nd, depth=depth+1, max_depth=max_depth)
+        base = str(base_dir or self.path)
+        if max_depth == 0:
+            yield base
+            return
+        # join each parent directory once and append the last level to it
+        tails = [sep + c for c in self.hexchars]
+        for combo in product(self.hexchars, repeat=max_depth - 1):
+            prefix = sep.join((base, *combo))
+            for tail in tails:
+                yield prefix + tail
     
     def create_dirs(self) -> int:
         """creates all directories used to store files
@@ -290,7 +452,12 @@ class DirectoryFileStore:
         Returns:
             int: number of directories created. will be 0 if they already exist.
         """
-        return asyncio.run(self.create_dirs_async())
+        created = 0
+        for fdir in self._leaf_dirs():
+            if not isdir(fdir):
+                makedirs(fdir, mode=self.dir_mode, exist_ok=True)
+                created += 1
+        return created
     
     async def create_dirs_async(self) -> int:
         """Asynchronously creates all directories used to store files
@@ -298,11 +465,11 @@ class DirectoryFileStore:
         Returns:
             int: number of directories created. will be 0 if they already exist.
         """
-        fdirs = self.enum_sub_dirs()
+        fdirs = self._leaf_dirs()
         created = 0
         for fdir in fdirs:
-            if not await aiofiles.os.path.isdir(str(fdir)):
-                await aiofiles.os.makedirs(str(fdir), mode=self.dir_mode, exist_ok=True)
+            if not await aiofiles.os.path.isdir(fdir):
+                await aiofiles.os.makedirs(fdir, mode=self.dir_mode, exist_ok=True)
                 created += 1
         return created
     
@@ -328,10 +495,31 @@ class DirectoryFileStore:
         Returns:
             int: files in store
         """
-        count = 0
-        for d in self.enum_sub_dirs():
-            count += sum(1 for x in d.glob('*') if not x.match('*.lock'))
-        return count
+        # fan out over at most 256 top level subtrees. each worker walks its own leaves lazily
+        # so memory stays flat regardless of dir_depth
+        top_depth = min(self.dir_depth, 2)
+        subtrees = list(self._leaf_dirs(max_depth=top_depth))
+        rest = self.dir_depth - top_depth
+        if len(subtrees) == 1:
+            return self._count_subtree(subtrees[0], rest)
+        with ThreadPoolExecutor(max_workers=min(64, len(subtrees))) as executor:
+            return sum(executor.map(self._count_subtree, subtrees, [rest] * len(subtrees)))
+    
+    def _count_subtree(self, base_dir: str, max_depth: int) -> int:
+        """counts stored files in every leaf directory below base_dir
+        """
+        return sum(self._count_one(d) for d in self._leaf_dirs(base_dir=base_dir, max_depth=max_depth))
+    
+    @staticmethod
+    def _count_one(dir_path: str|Path) -> int:
+        """counts stored files in a single bottom level directory. missing directories count as 0.
+            dot files are skipped so the count cache and staged copies are not counted at depth 0.
+        """
+        try:
+            with scandir(dir_path) as it:
+                return sum(1 for e in it if not e.name.startswith('.'))
+        except FileNotFoundError:
+            return 0
     
     async def count_stored_async(self) -> int:
         return await asyncio.to_thread(self.count_stored)
@@ -355,27 +543,11 @@ class DirectoryFileStore:
         """
         src = source_path or ''
         src = Path(src)
-        print('src', src)
-        if not src.exists() or not src.is_file():
+        if not src.is_file():
             raise InvalidFileError(f"source path is not a valid file")
         
         dst = self.file_path(path_key=path_key, file_size=file_size)
-        
-        print("destination", dst)
-        lock = self.get_lock(file_path=self.lock_path(path_key=path_key, file_size=file_size), is_async=False)
-        with lock:
-            if not dst.exists():
-                if not dst.parent.exists():
-                    raise InvalidDirectoryError(f"Parent directory {str(dst.parent)} does not exist.")
-                if rename:
-                    src.rename(dst)
-                else:
-                    copy(str(src), str(dst))
-                dst.chmod(mode=self.file_mode)
-                self._stored += 1
-            else:
-                src.unlink()
-        return dst.exists()
+        return self._ingest_file(src=src, dst=dst, path_key=path_key, rename=rename)
     
     async def add_file_async(self, source_path: str, path_key: str, file_size: int, rename: bool = False) -> bool:
         """Asynchronously adds a file to the store
@@ -399,20 +571,79 @@ class DirectoryFileStore:
             raise InvalidFileError(f"source path {src} is not a valid file")
         
         dst = self.file_path(path_key=path_key, file_size=file_size)
-        lock = self.get_lock(file_path=self.lock_path(path_key=path_key, file_size=file_size), is_async=True)
-        async with lock:
-            if not await aiofiles.os.path.isfile(str(dst)):
-                if not await aiofiles.os.path.isdir(str(dst.parent)):
-                    raise InvalidDirectoryError(f"Parent directory {str(dst.parent)} does not exist.")
+        return await asyncio.to_thread(self._ingest_file, src=Path(src), dst=dst, path_key=path_key, rename=rename)
+    
+    def _ingest_file(self, src: Path, dst: Path, path_key: str, rename: bool) -> bool:
+        """hard links the source (or a copy of it) to the destination.
+            os.link fails if the destination exists, so a duplicate is detected without a lock file.
+        """
+        with self.get_lock(file_path=str(dst)):
+            if not dst.parent.is_dir():
+                raise InvalidDirectoryError(f"Parent directory {str(dst.parent)} does not exist.")
+            added = False
+            try:
                 if rename:
-                    await aiofiles.os.rename(src, str(dst))
+                    try:
+                        link(src, dst)
+                    except FileExistsError:
+                        raise
+                    except OSError:
+                        # hard links unavailable (e.g. across filesystems). copy instead
+                        self._copy_new(src=src, dst=dst)
                 else:
-                    await asyncio.to_thread(copy, src, str(dst))    
-                await asyncio.to_thread(chmod, str(dst), self.file_mode)
-                self._stored += 1
-            else:
-                await aiofiles.os.remove(src)
-        return await aiofiles.os.path.isfile(str(dst))
+                    self._copy_new(src=src, dst=dst)
+                added = True
+            except FileExistsError:
+                pass
+            if added:
+                dst.chmod(mode=self.file_mode)
+                self._update_count(1)
+            if rename or not added:
+                src.unlink()
+        return dst.is_file()
+    
+    def _copy_new(self, src: Path, dst: Path):
+        """copies src to dst without replacing an existing file. raises FileExistsError if dst exists.
+            a staged copy is hard linked into place so dst never appears partially written.
+            if the store's filesystem doesn't support hard links, dst is created exclusively and written in place.
+        """
+        if self._hard_links:
+            staged = self._stage_copy(src=src)
+            try:
+                link(staged, dst)
+                return
+            except FileExistsError:
+                raise
+            except OSError:
+                self._hard_links = False
+            finally:
+                staged.unlink()
+        
+        fd = os_open(dst, O_WRONLY | O_CREAT | O_EXCL, self.file_mode)
+        try:
+            with open(fd, 'wb') as fout, open(src, 'rb') as fin:
+                copyfileobj(fin, fout)
+        except BaseException:
+            dst.unlink(missing_ok=True)
+            raise
+    
+    def _stage_copy(self, src: Path) -> Path:
+        """copies a file into the top level of the store so it can be hard linked into place
+        """
+        fd, staged = mkstemp(dir=self.path, prefix=".garnerd_", suffix=".tmp")
+        close(fd)
+        copyfile(src, staged)
+        return Path(staged)
+    
+    def _update_count(self, delta: int):
+        """adjusts the number of stored files and saves the count cache.
+            the cached count is re-read under the count file lock so concurrent stores don't overwrite each other.
+        """
+        with self.count_file_lock():
+            # another process may have changed the count since it was loaded
+            self.load_count()
+            self._stored = max(self._stored + delta, 0)
+            self.save_count()
     
     def remove_file(self, path_key: str, file_size: int) -> bool:
         """Remove a file from the store
@@ -425,12 +656,14 @@ class DirectoryFileStore:
             bool: True if the file does not exist in the store regardless if this action removed the file.
         """
         fpath = self.file_path(path_key=path_key, file_size=file_size)
-        lock = self.get_lock(file_path=self.lock_path(path_key=path_key, file_size=file_size), is_async=False)
-        with lock:
-            if fpath.is_file():
+        with self.get_lock(file_path=str(fpath)):
+            self._exists.pop(fpath, None)
+            try:
                 fpath.unlink()
-                if self._stored > 0:
-                    self._stored -= 1
+            except FileNotFoundError:
+                pass
+            else:
+                self._update_count(-1)
         return not fpath.exists()
 
     async def remove_file_async(self, path_key: str, file_size: int) -> bool:
@@ -443,14 +676,7 @@ class DirectoryFileStore:
         Returns:
             bool: True if the file does not exist in the store regardless if this action removed the file.
         """
-        fpath = self.file_path(path_key=path_key, file_size=file_size)
-        lock = self.get_lock(file_path=self.lock_path(path_key=path_key, file_size=file_size), is_async=True)
-        async with lock:
-            if await aiofiles.os.path.isfile(str(fpath)):
-                await aiofiles.os.remove(str(fpath))
-                if self._stored > 0:
-                    self._stored -= 1
-        return not fpath.exists()
+        return await asyncio.to_thread(self.remove_file, path_key=path_key, file_size=file_size)
     
     def get_free(self) -> float:
         """
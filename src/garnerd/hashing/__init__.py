@@ -1 +1 @@
-from hasher import HashingConfig, Hasher, HashingProcessor, SHMHasher
+from .hasher import HashingConfig, Hasher, HashingProcessor, SHMHasher
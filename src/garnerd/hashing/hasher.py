@@ -1,14 +1,42 @@
 from hashlib import md5, sha1, sha224, sha256, sha384, sha512
 from _hashlib import HASH
-from collections.abc import Iterable, Iterator, Buffer
+from collections.abc import Iterable, Iterator, Buffer, Mapping
+from types import MappingProxyType
 from concurrent import futures
 from typing import Callable, Optional, BinaryIO, Self
 from multiprocessing import Manager
-
-from ..buffers import SHMFanoutBuffer, SHMBufferSync
+from threading import Thread
+from queue import SimpleQueue
+from mmap import mmap
+from functools import partial
+from stat import S_ISREG
+import os
+
+from ..buffers import SHMBarrier, SHMFanoutBuffer, SHMBufferSync
+from ..exceptions import SharedMemoryError
 from ..buffers import SHMProcessor, FileReadingProcessor, FileMagicProcessor, FileWritingProcessor
 
 
+_SYSTEM_HASHERS = MappingProxyType(dict(
+                    md5=md5,
+                    sha1=sha1,
+                    sha256=sha256,
+                    sha224=sha224,
+                    sha384=sha384,
+                    sha512=sha512
+                ))
+
+_DEFAULT_CONFIG = MappingProxyType(dict(
+                    md5=True,
+                    sha1=True,
+                    sha256=True, 
+                    sha224=False, 
+                    sha384=False, 
+                    sha512=False, 
+                    buff_size=1048576
+                ))
+
+
 class HashingConfig:
     _buff_size: int
     _selected_hashes: set[str]
@@ -126,35 +154,22 @@ class HashingConfig:
             return False
     
     @property
-    def default_config(self) -> dict[str,int|bool]:
+    def default_config(self) -> Mapping[str,int|bool]:
         """Default values for all configuration variables.
 
         Returns:
-            dict: key/value pairs with default hasher class configuration
+            Mapping: read only key/value pairs with default hasher class configuration
         """
-        return dict(
-                md5=True,
-                sha1=True,
-                sha256=True, 
-                sha224=False, 
-                sha384=False, 
-                sha512=False, 
-                buff_size=131072
-            )
+        return _DEFAULT_CONFIG
 
     @classmethod
-    def system_hashers(cls) -> dict[str,Callable[[Optional[Buffer]],HASH]]:
+    def system_hashers(cls) -> Mapping[str,Callable[[Optional[Buffer]],HASH]]:
         """All hashing provided by the system
 
         Returns:
-            dict: key = hash name, value = class for instancing
+            Mapping: read only. key = hash name, value = class for instancing
         """
-        return dict(md5=md5,
-                    sha1=sha1,
-                    sha256=sha256,
-                    sha224=sha224,
-                    sha384=sha384,
-                    sha512=sha512)
+        return _SYSTEM_HASHERS
 
 
 class Hasher:
@@ -184,7 +199,7 @@ class Hasher:
     def clear(self):
         """reset all hashing and byte counter
         """
-        self.active_hashes = self.hashing_config.hashers()
+        self._active_hashes = self.hashing_config.hashers()
         self._byte_count = 0
     
     def update(self, buffer: bytes|bytearray|memoryview):
@@ -212,17 +227,136 @@ class Hasher:
         Returns:
             dict: dictionary report of hash information / metadata for file
         """
-        
-        ba = bytearray(self.hashing_config.buff_size)
-        mv = memoryview(ba)
+        hashers = tuple(self.active_hashes.values())
+        buff_size = self.hashing_config.buff_size
+        # anonymous mmap gives a page aligned buffer
+        mv = memoryview(mmap(-1, buff_size))
         with open(file_path, 'rb', buffering=0) as f:
-            while n := f.readinto(mv):
-                self.update(mv[:n])
+            st = os.fstat(f.fileno())
+            regular = S_ISREG(st.st_mode)
+            if regular and hasattr(os, 'posix_fadvise'):
+                # request a larger readahead window from the kernel. only a hint, never fail on it
+                try:
+                    os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+                except OSError:
+                    pass
+            readinto = f.readinto
+            # pipes and devices have no known size, so treat them as more than one chunk
+            if hashers and (not regular or st.st_size > buff_size):
+                # more than one chunk. read the next chunk while the current one is hashed
+                buffers = (mv, memoryview(mmap(-1, buff_size)))
+                if len(hashers) > 1:
+                    self._hash_threaded(readinto, hashers, buffers)
+                else:
+                    self._hash_prefetch(readinto, hashers[0].update, buffers)
+            elif len(hashers) == 1:
+                update = hashers[0].update
+                while n := readinto(mv):
+                    update(mv[:n])
+                    self._byte_count += n
+            else:
+                while n := readinto(mv):
+                    chunk = mv[:n]
+                    for h in hashers:
+                        h.update(chunk)
+                    self._byte_count += n
         
         report = self.report()            
         report['path'] = file_path
         return report
     
+    def _hash_threaded(self, readinto: Callable[[memoryview], int], hashers: tuple[HASH], buffers: tuple[memoryview, memoryview]):
+        """Runs each hasher on its own thread. hashlib releases the GIL while hashing large buffers
+            so the hashers run in parallel. The next chunk is read into the other buffer while
+            the current one is being hashed.
+
+        Args:
+            readinto (Callable[[memoryview], int]): readinto method of the file being hashed
+            hashers (tuple[HASH]): hashing objects to update
+            buffers (tuple[memoryview, memoryview]): two buffers of equal size used alternately
+        """
+        done = SimpleQueue()
+        queues = [SimpleQueue() for _ in hashers]
+        
+        def worker(hshr: HASH, q: SimpleQueue):
+            try:
+                while (chunk := q.get()) is not None:
+                    hshr.update(chunk)
+                    done.put(None)
+            except BaseException as e:
+                # reported in place of the chunk's completion so the main thread stops waiting
+                done.put(e)
+        
+        threads = [Thread(target=worker, args=(h, q), daemon=True) for h, q in zip(hashers, queues)]
+        for t in threads:
+            t.start()
+        
+        pending = False
+        idx = 0
+        try:
+            while True:
+                mv = buffers[idx]
+                n = readinto(mv)
+                # other buffer must be fully hashed before it is reused on the next read
+                if pending:
+                    errors = [e for e in (done.get() for _ in hashers) if e is not None]
+                    pending = False
+                    if errors:
+                        raise errors[0]
+                if not n:
+                    break
+                chunk = mv[:n]
+                for q in queues:
+                    q.put(chunk)
+                pending = True
+                self._byte_count += n
+                idx ^= 1
+        finally:
+            for q in queues:
+                q.put(None)
+            for t in threads:
+                t.join()
+    
+    def _hash_prefetch(self, readinto: Callable[[memoryview], int], update: Callable[[Buffer], None], buffers: tuple[memoryview, memoryview]):
+        """Reads the file on a background thread while the current chunk is hashed.
+            file reads and hashlib both release the GIL so reading and hashing overlap.
+
+        Args:
+            readinto (Callable[[memoryview], int]): readinto method of the file being hashed
+            update (Callable[[Buffer], None]): update method of the hashing object
+            buffers (tuple[memoryview, memoryview]): two buffers of equal size used alternately
+        """
+        free = SimpleQueue()
+        filled = SimpleQueue()
+        for mv in buffers:
+            free.put(mv)
+        
+        def reader():
+            try:
+                while (mv := free.get()) is not None:
+                    n = readinto(mv)
+                    filled.put((mv, n))
+                    if not n:
+                        break
+            except BaseException as e:
+                filled.put((None, e))
+        
+        t = Thread(target=reader, daemon=True)
+        t.start()
+        try:
+            while True:
+                mv, n = filled.get()
+                if mv is None:
+                    raise n
+                if not n:
+                    break
+                update(mv[:n])
+                self._byte_count += n
+                free.put(mv)
+        finally:
+            free.put(None)
+            t.join()
+    
     @staticmethod
     def hash_file_worker(file_path: str, cfg: dict | None = None) -> dict:
         """Hashes file and returns report. Used by threading/multiprocessing as target.
@@ -249,23 +383,28 @@ class Hasher:
         report['success'] = True
         return report
 
-    def hash_multi(self, file_list: Iterable[str], max_threads: int = 2, cfg: dict | None = None)-> Iterator[dict]:
+    def hash_multi(self, file_list: Iterable[str], max_threads: int = 2, cfg: dict | None = None, chunksize: int | None = None)-> Iterator[dict]:
         """hash multiple files using concurrency
         
         Args:
             file_list (Iterable[str]): file paths to hash
             max_threads (int): number of available threads or process in the pool. default 2
-            cfg (dict|None): Hasher config. If None (default) then use the Hasher class default config
+            cfg (dict|None): Hasher config. If None (default) then use this Hasher's config
+            chunksize (int|None): number of file paths sent to a worker process at a time.
+                If None (default) then sized so every worker gets about 4 batches
             
         yields:
-            Iterator[dict]: report for each file as completed
+            Iterator[dict]: report for each file in the order of file_list
         """
-        flist = list()
+        if cfg is None:
+            cfg = self.hashing_config.config
+        # map consumes the whole iterable up front anyway
+        files = list(file_list)
+        if chunksize is None:
+            chunksize = max(1, len(files) // (max_threads * 4))
+        worker = partial(Hasher.hash_file_worker, cfg=cfg)
         with futures.ProcessPoolExecutor(max_workers=max_threads) as executor:
-            for f in file_list:
-                flist.append(executor.submit(self.hash_file_worker, f, cfg))
-            for fr in futures.as_completed(flist):
-                yield fr.result()
+            yield from executor.map(worker, files, chunksize=chunksize)
 
 
 class HashingProcessor(SHMProcessor):
@@ -283,8 +422,7 @@ class HashingProcessor(SHMProcessor):
         Raises:
             ValueError: invalid hash label
         """
-        sys_hashers = HashingConfig.system_hashers()
-        if hash_label not in sys_hashers:
+        if hash_label not in _SYSTEM_HASHERS:
             raise ValueError("hash_label must be an available system hasher")
         super().__init__(buff_syncs=buff_syncs)
         self.hasher = None
@@ -297,7 +435,7 @@ class HashingProcessor(SHMProcessor):
         return super().report()
     
     def process(self):
-        self.hasher = HashingConfig.system_hashers()[self.hash_label]()
+        self.hasher = _SYSTEM_HASHERS[self.hash_label]()
         return super().process()
         
     def handle_data(self, data):
@@ -305,20 +443,43 @@ class HashingProcessor(SHMProcessor):
 
 
 class SHMHasher:
+    MAX_PARTIES = 64
     buffer_size: int
     buffers: list[SHMFanoutBuffer]
+    max_workers: int
+    _executor: futures.ProcessPoolExecutor|None
+    _pending: list[futures.Future]
     
-    def __init__(self, buffer_count: int = 2, buffer_size: int = (128 * 1024 * 1024)):
+    def __init__(self, buffer_count: int = 2, buffer_size: int = (128 * 1024 * 1024), max_workers: int = 8):
         """Use shared memory buffers to perform simultaneous hashing and other metadata processing for files
 
         Args:
             buffer_count (int, optional): number of shared memory buffers to use.
                 Defaults to 2. More than 2 is probably not required and increasing probably won't improve performance.
             buffer_size (int, optional): size in bytes of each buffer. Defaults to 128M (128 * 1024 * 1024).
+            max_workers (int, optional): size of the worker process pool kept for the life of this object.
+                One worker is needed per processor plus the file reader. The pool is enlarged if a file needs more.
+                Defaults to 8 (reader, file magic and all system hashers).
         """
+        self._executor = None
+        self._pending = list()
         self.buffer_size = buffer_size
         buffer_count = max(buffer_count, 2)
-        self.buffers = [SHMFanoutBuffer(create=True, size=self.buffer_size) for _ in range(0,buffer_count)]
+        self.buffers = [SHMFanoutBuffer(create=True, size=self.buffer_size, max_parties=self.MAX_PARTIES) for _ in range(0,buffer_count)]
+        self.max_workers = min(max(max_workers, 2), self.MAX_PARTIES)
+        self._executor = futures.ProcessPoolExecutor(max_workers=self.max_workers)
+    
+    def _get_executor(self, workers: int) -> futures.ProcessPoolExecutor:
+        """returns the worker pool, replacing it with a larger one if fewer than workers processes are available.
+            every participant must be running at once or the barriers never release.
+        """
+        if workers > self.MAX_PARTIES:
+            raise ValueError(f"Too many processors: maximum of {self.MAX_PARTIES - 1} is supported")
+        if workers > self.max_workers:
+            self._executor.shutdown()
+            self.max_workers = workers
+            self._executor = futures.ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
 
     def hash_file(self, file_path: str, *args, file_magic: bool = True, file_mime: bool = True) -> dict:
         """hash a file
@@ -330,51 +491,76 @@ class SHMHasher:
 
         Raises:
             Exception: Worker process errors
+            SharedMemoryError: workers from an earlier call are still running
 
         Returns:
             dict: report containing metadata including any set hashes.
         """
-        report = dict()
-        with futures.ProcessPoolExecutor() as executor:
-            processor_list: list[SHMProcessor] = list()
-            futures_list = list()
-            
-            bsyncs = [SHMBufferSync(x.name, None) for x in self.buffers]
-            filereader = FileReadingProcessor(bsyncs, file_path=file_path)
-            if file_magic or file_mime:
-                processor_list.append(FileMagicProcessor(bsyncs, magic = file_magic, mime = file_mime))
-            for arg in args:
-                try:
-                    hp = HashingProcessor(bsyncs, hash_label=arg)
-                except ValueError:
-                    pass
-                else:
-                    processor_list.append(hp)
-            max_threads = len(processor_list) + 1
-            
+        if any(not fr.done() for fr in self._pending):
+            raise SharedMemoryError("Workers from a previous hash_file call are still using the buffers")
+        processor_list: list[SHMProcessor] = list()
+        futures_list = list()
+        
+        bsyncs = [SHMBufferSync(x.name) for x in self.buffers]
+        filereader = FileReadingProcessor(bsyncs, file_path=file_path)
+        if file_magic or file_mime:
+            processor_list.append(FileMagicProcessor(bsyncs, magic = file_magic, mime = file_mime))
+        for arg in args:
+            try:
+                hp = HashingProcessor(bsyncs, hash_label=arg)
+            except ValueError:
+                pass
+            else:
+                processor_list.append(hp)
+        max_threads = len(processor_list) + 1
+        
+        if SHMBarrier.supported():
+            # workers find the barrier in the control block of each buffer they attach to
+            for buff in self.buffers:
+                buff.reset_barrier(max_threads)
+        else:
             mgr = Manager()
             for bsync in bsyncs:
                 bsync.barrier = mgr.Barrier(max_threads)
-            
-            reader = executor.submit(filereader.process)
-            for proc in processor_list:
-                futures_list.append(executor.submit(proc.process))
-            
-            report = reader.result()
-            for fr in futures.as_completed(futures_list):
-                d: dict = fr.result()
-                if d is not None:
-                    sz = d.get('size', 0)
-                    if sz == report['size']:
-                        report.update(d)
-                    else:
-                        raise Exception("A hash worker did not get expected number of bytes")
+        
+        executor = self._get_executor(max_threads)
+        self._pending = futures_list
+        futures_list.append(executor.submit(filereader.process))
+        for proc in processor_list:
+            futures_list.append(executor.submit(proc.process))
+        
+        try:
+            report = futures_list[0].result()
+        except BaseException:
+            for fr in futures_list:
+                fr.cancel()
+            raise
+        finally:
+            # the buffers' control blocks are reset on the next call, so no worker may still be using them.
+            # a failed reader ends the stream, so consumers finish on their own
+            futures.wait(futures_list)
+            self._pending = list()
+        for fr in futures.as_completed(futures_list[1:]):
+            d: dict = fr.result()
+            if d is not None:
+                sz = d.get('size', 0)
+                if sz == report['size']:
+                    report.update(d)
                 else:
-                    raise Exception("Worker process returned None")
-            
+                    raise Exception("A hash worker did not get expected number of bytes")
+            else:
+                raise Exception("Worker process returned None")
+        
         return report
     
     def __del__(self):
+        if self._executor is not None:
+            try:
+                self._executor.shutdown()
+            except OSError:
+                # at interpreter exit the pool may already have been torn down by concurrent.futures
+                pass
+            self._executor = None
         for b in self.buffers:
             b.close()
             b.unlink()
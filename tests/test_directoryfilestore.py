@@ -1,11 +1,12 @@
 import unittest
 import asyncio
 from pathlib import Path
-from src.garnerd.filestore.directory import DirectoryFileStore
+from src.garnerd.filestore.directory import DirectoryFileStore, size_to_basex
 from tempfile import TemporaryDirectory
 from shutil import rmtree, copy
 from os.path import isdir
 from time import sleep
+from unittest.mock import patch
 
 
 class TestDirectoryFileStore(unittest.TestCase):
@@ -60,6 +61,8 @@ class TestDirectoryFileStore(unittest.TestCase):
         dfs.hexchars = ['a', 'b', 'c', 'd']
         subdirs = list(dfs.enum_sub_dirs())
         self.assertEqual(len(subdirs), 4 ** 3)
+        self.assertEqual(str(subdirs[0]), f'{self.temp_dir}/a/a/a')
+        self.assertEqual(str(subdirs[-1]), f'{self.temp_dir}/d/d/d')
         
     def test_create_dirs(self):
         self.clean_temp()
@@ -122,4 +125,174 @@ class TestDirectoryFileStore(unittest.TestCase):
         dfs.dir_depth = 2
         self.assertEqual(dfs.path_list(path_key="abcd"), ["a","b","cd"])
         dfs.dir_depth = 3
-        self.assertEqual(dfs.path_list(path_key="abcdef"), ["a","b","c","def"])
\ No newline at end of file
+        self.assertEqual(dfs.path_list(path_key="abcdef"), ["a","b","c","def"])
+        with self.assertRaises(ValueError):
+            dfs.path_list(path_key="0xabcdef")
+    
+    def test_count_stored(self):
+        pkey = "9ff938883748a4d3cf9c09a05b1f0ec073645cc26cda89fe4f4baa532ece9ca0"
+        test_file = Path(self.test_files_path) / "plain_text.txt"
+        
+        self.clean_temp()
+        dfs = DirectoryFileStore(path=self.temp_dir, dir_depth=2)
+        dfs.init_store()
+        self.assertEqual(dfs.count_stored(), 0)
+        dfs.add_file(source_path=str(test_file), path_key=pkey, file_size=1)
+        dfs.add_file(source_path=str(test_file), path_key=pkey[::-1], file_size=1)
+        self.assertEqual(dfs.count_stored(), 2)
+        self.assertEqual(asyncio.run(dfs.count_stored_async()), 2)
+    
+    def test_count_cache(self):
+        pkey = "9ff938883748a4d3cf9c09a05b1f0ec073645cc26cda89fe4f4baa532ece9ca0"
+        test_file = Path(self.test_files_path) / "plain_text.txt"
+        
+        self.clean_temp()
+        dfs = DirectoryFileStore(path=self.temp_dir, dir_depth=2)
+        dfs.init_store()
+        self.assertTrue(dfs.count_path.is_file())
+        dfs.add_file(source_path=str(test_file), path_key=pkey, file_size=1)
+        
+        dfs = DirectoryFileStore(path=self.temp_dir, dir_depth=2)
+        self.assertTrue(dfs.load_count())
+        self.assertEqual(dfs.files_stored(), 1)
+        
+        dfs.count_path.write_text("garbage")
+        dfs = DirectoryFileStore(path=self.temp_dir, dir_depth=2)
+        self.assertFalse(dfs.load_count())
+        _, stored = dfs.init_store()
+        self.assertEqual(stored, 1)
+        self.assertTrue(dfs.load_count())
+        
+        dfs.remove_file(path_key=pkey, file_size=1)
+        dfs = DirectoryFileStore(path=self.temp_dir, dir_depth=2)
+        _, stored = dfs.init_store()
+        self.assertEqual(stored, 0)
+        
+        # two stores sharing a path each add a file
+        first = DirectoryFileStore(path=self.temp_dir, dir_depth=2)
+        second = DirectoryFileStore(path=self.temp_dir, dir_depth=2)
+        first.init_store()
+        second.init_store()
+        first.add_file(source_path=str(test_file), path_key=pkey, file_size=1)
+        second.add_file(source_path=str(test_file), path_key=pkey[::-1], file_size=1)
+        dfs = DirectoryFileStore(path=self.temp_dir, dir_depth=2)
+        self.assertTrue(dfs.load_count())
+        self.assertEqual(dfs.files_stored(), 2)
+        self.assertEqual(dfs.count_stored(), 2)
+    
+    def test_add_duplicate_file(self):
+        pkey = "9ff938883748a4d3cf9c09a05b1f0ec073645cc26cda89fe4f4baa532ece9ca0"
+        test_file = Path(self.test_files_path) / "plain_text.txt"
+        
+        self.clean_temp()
+        dfs = DirectoryFileStore(path=self.temp_dir, dir_depth=2)
+        dfs.init_store()
+        src_dir = Path(self.temp_dir) / "src"
+        src_dir.mkdir()
+        first = Path(copy(str(test_file), str(src_dir / "first.txt")))
+        second = Path(copy(str(test_file), str(src_dir / "second.txt")))
+        self.assertTrue(dfs.add_file(source_path=str(first), path_key=pkey, file_size=1, rename=True))
+        self.assertFalse(first.exists())
+        self.assertTrue(dfs.add_file(source_path=str(second), path_key=pkey, file_size=1))
+        self.assertFalse(second.exists())
+        self.assertEqual(dfs.files_stored(), 1)
+        self.assertEqual(dfs.count_stored(), 1)
+    
+    def test_size_to_basex(self):
+        self.assertEqual(size_to_basex(0), '0')
+        self.assertEqual(size_to_basex(31), 'v')
+        self.assertEqual(size_to_basex(32), '10')
+        self.assertEqual(size_to_basex(123), '3r')
+        self.assertEqual(size_to_basex(2 ** 40), '100000000')
+        self.assertEqual(size_to_basex(255, base_text="0123456789"), '255')
+    
+    def test_has_file(self):
+        pkey = "9ff938883748a4d3cf9c09a05b1f0ec073645cc26cda89fe4f4baa532ece9ca0"
+        test_file = Path(self.test_files_path) / "plain_text.txt"
+        
+        self.clean_temp()
+        dfs = DirectoryFileStore(path=self.temp_dir, dir_depth=2)
+        dfs.init_store()
+        self.assertFalse(dfs.has_file(path_key=pkey, file_size=1))
+        dfs.add_file(source_path=str(test_file), path_key=pkey, file_size=1)
+        self.assertTrue(dfs.has_file(path_key=pkey, file_size=1))
+        self.assertTrue(dfs.has_file(path_key=pkey, file_size=1))
+        self.assertIs(dfs.file_path(path_key=pkey, file_size=1), dfs.file_path(path_key=pkey, file_size=1))
+        dfs.remove_file(path_key=pkey, file_size=1)
+        self.assertFalse(dfs.has_file(path_key=pkey, file_size=1))
+        self.assertFalse(asyncio.run(dfs.has_file_async(path_key=pkey, file_size=1)))
+    
+    def test_zero_depth(self):
+        pkey = "9ff938883748a4d3cf9c09a05b1f0ec073645cc26cda89fe4f4baa532ece9ca0"
+        test_file = Path(self.test_files_path) / "plain_text.txt"
+        
+        self.clean_temp()
+        dfs = DirectoryFileStore(path=self.temp_dir, dir_depth=0)
+        self.assertEqual([str(d) for d in dfs.enum_sub_dirs()], [self.temp_dir])
+        self.assertEqual(dfs.init_store(), (0, 0))
+        self.assertEqual(str(dfs.file_path(path_key=pkey, file_size=1)), f'{self.temp_dir}/{pkey}.1')
+        dfs.add_file(source_path=str(test_file), path_key=pkey, file_size=1)
+        self.assertEqual(dfs.count_stored(), 1)
+        self.assertEqual(dfs.rebuild_count(), 1)
+    
+    def test_add_file_without_hard_links(self):
+        pkey = "9ff938883748a4d3cf9c09a05b1f0ec073645cc26cda89fe4f4baa532ece9ca0"
+        test_file = Path(self.test_files_path) / "plain_text.txt"
+        
+        def no_link(src, dst):
+            raise PermissionError("hard links not supported")
+        
+        self.clean_temp()
+        dfs = DirectoryFileStore(path=self.temp_dir, dir_depth=2)
+        dfs.init_store()
+        with patch("src.garnerd.filestore.directory.link", no_link):
+            self.assertTrue(dfs.add_file(source_path=str(test_file), path_key=pkey, file_size=1))
+            self.assertTrue(dfs.add_file(source_path=str(test_file), path_key=pkey[::-1], file_size=1))
+            src_dir = Path(self.temp_dir) / "src"
+            src_dir.mkdir()
+            dup = Path(copy(str(test_file), str(src_dir / "dup.txt")))
+            self.assertTrue(dfs.add_file(source_path=str(dup), path_key=pkey, file_size=1, rename=True))
+        stored = dfs.file_path(path_key=pkey, file_size=1)
+        self.assertEqual(stored.read_bytes(), test_file.read_bytes())
+        self.assertEqual(dfs.files_stored(), 2)
+        self.assertEqual(dfs.count_stored(), 2)
+    
+    def test_get_lock(self):
+        self.clean_temp()
+        dfs = DirectoryFileStore(path=self.temp_dir)
+        lock = dfs.get_lock(file_path="abc")
+        self.assertIs(lock, dfs.get_lock(file_path="abc"))
+        
+        async def use_async_lock():
+            async with dfs.get_lock(file_path="abc", is_async=True):
+                self.assertTrue(lock.locked())
+        
+        asyncio.run(use_async_lock())
+        self.assertFalse(lock.locked())
+        dfs.use_file_lock = False
+        with dfs.get_lock(file_path="abc"):
+            self.assertFalse(lock.locked())
+    
+    def test_get_lock_cancelled(self):
+        self.clean_temp()
+        dfs = DirectoryFileStore(path=self.temp_dir)
+        lock = dfs.get_lock(file_path="cancelled")
+        
+        async def enter():
+            async with dfs.get_lock(file_path="cancelled", is_async=True):
+                pass
+        
+        async def cancel_while_waiting():
+            with lock:
+                with self.assertRaises(asyncio.TimeoutError):
+                    await asyncio.wait_for(enter(), timeout=0.05)
+            # the waiting thread takes the lock after it's released here. it must not keep it
+            for _ in range(100):
+                await asyncio.sleep(0.01)
+                if lock.acquire(blocking=False):
+                    lock.release()
+                    return True
+            return False
+        
+        self.assertTrue(asyncio.run(cancel_while_waiting()))
+
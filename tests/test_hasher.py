@@ -0,0 +1,91 @@
+import unittest
+import hashlib
+import os
+from threading import Thread
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from src.garnerd.hashing import Hasher
+
+
+class TestHasher(unittest.TestCase):
+    _temp_dir: TemporaryDirectory
+    temp_dir: str
+    
+    def setUp(self):
+        self._temp_dir = TemporaryDirectory(dir='/dev/shm')
+        self.temp_dir = self._temp_dir.name
+    
+    def tearDown(self):
+        self._temp_dir.cleanup()
+        self._temp_dir = None
+    
+    def make_file(self, size: int) -> Path:
+        fpath = Path(self.temp_dir) / f"data_{size}.bin"
+        fpath.write_bytes(bytes(i * 7 & 0xFF for i in range(size)))
+        return fpath
+    
+    def expected(self, fpath: Path, *labels: str) -> dict:
+        data = fpath.read_bytes()
+        report = {label: hashlib.new(label, data).hexdigest() for label in labels}
+        report['size'] = len(data)
+        report['path'] = str(fpath)
+        return report
+    
+    def test_hash_file(self):
+        buff_size = 4096
+        for size in (0, 100, buff_size, buff_size * 3, buff_size * 3 + 17):
+            fpath = self.make_file(size)
+            hshr = Hasher(buff_size=buff_size)
+            self.assertEqual(hshr.hash_file(str(fpath)), self.expected(fpath, 'md5', 'sha1', 'sha256'))
+    
+    def test_hash_file_single(self):
+        buff_size = 4096
+        for size in (0, 100, buff_size, buff_size * 3, buff_size * 3 + 17):
+            fpath = self.make_file(size)
+            hshr = Hasher(buff_size=buff_size, sha1=False, sha256=False)
+            self.assertEqual(hshr.hash_file(str(fpath)), self.expected(fpath, 'md5'))
+    
+    def test_hash_file_worker_error(self):
+        class BrokenHash:
+            def update(self, data):
+                raise RuntimeError("broken hash")
+        
+        fpath = self.make_file(4096 * 3)
+        hshr = Hasher(buff_size=4096)
+        hshr._active_hashes['md5'] = BrokenHash()
+        with self.assertRaises(RuntimeError):
+            hshr.hash_file(str(fpath))
+        
+        hshr = Hasher(buff_size=4096, sha1=False, sha256=False)
+        hshr._active_hashes['md5'] = BrokenHash()
+        with self.assertRaises(RuntimeError):
+            hshr.hash_file(str(fpath))
+    
+    def test_hash_pipe(self):
+        buff_size = 4096
+        data = bytes(i * 7 & 0xFF for i in range(buff_size * 3 + 17))
+        for cfg in (dict(), dict(sha1=False, sha256=False)):
+            rfd, wfd = os.pipe()
+            
+            def feed():
+                with open(wfd, 'wb') as w:
+                    w.write(data)
+            
+            writer = Thread(target=feed)
+            writer.start()
+            try:
+                report = Hasher(buff_size=buff_size, **cfg).hash_file(f"/dev/fd/{rfd}")
+            finally:
+                writer.join()
+                os.close(rfd)
+            self.assertEqual(report['size'], len(data))
+            self.assertEqual(report['md5'], hashlib.md5(data).hexdigest())
+    
+    def test_hash_multi(self):
+        paths = [self.make_file(size) for size in (0, 100, 5000, 20000, 4096 * 3)]
+        hshr = Hasher(buff_size=4096)
+        reports = list(hshr.hash_multi([str(p) for p in paths], max_threads=2))
+        self.assertEqual(reports, [self.expected(p, 'md5', 'sha1', 'sha256') | dict(success=True) for p in paths])
+        
+        reports = list(hshr.hash_multi((str(p) for p in paths), max_threads=2, cfg=dict(md5=True, sha1=False, sha256=False)))
+        self.assertEqual(reports, [self.expected(p, 'md5') | dict(success=True) for p in paths])
@@ -0,0 +1,183 @@
+import unittest
+import hashlib
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from multiprocessing import Process, Queue, Array
+from src.garnerd.buffers import SHMBarrier, SHMFanoutBuffer, SHMBufferSync
+from src.garnerd.hashing import SHMHasher
+
+
+def barrier_worker(name: str, index: int, rounds: int, slots, errors: Queue):
+    barrier = SHMBarrier(name=name, timeout=30)
+    try:
+        for r in range(rounds):
+            slots[index] = r
+            barrier.wait()
+            # every party reached this round and none is more than one round ahead
+            seen = list(slots)
+            if min(seen) < r or max(seen) > r + 1:
+                errors.put(f"party {index} round {r} saw {seen}")
+                return
+    except Exception as e:
+        errors.put(f"party {index}: {e!r}")
+    finally:
+        barrier.close()
+
+
+def producer_worker(names: list[str], chunks: int, chunk_size: int, errors: Queue):
+    bsyncs = [SHMBufferSync(name, timeout=30) for name in names]
+    try:
+        for bsync in bsyncs:
+            bsync.load_buffer()
+        for i in range(chunks):
+            bsync = bsyncs[i % len(bsyncs)]
+            bsync.acquire_write()
+            # last chunk is short to mark the end of the stream
+            size = chunk_size if i < chunks - 1 else 1
+            bsync.shmbuffer.save_bytes(bytes([i & 0xFF]) * size)
+            bsync.publish()
+    except Exception as e:
+        errors.put(f"producer: {e!r}")
+    finally:
+        for bsync in bsyncs:
+            bsync.close()
+
+
+def consumer_worker(names: list[str], results: Queue, errors: Queue):
+    bsyncs = [SHMBufferSync(name, timeout=30) for name in names]
+    seen = list()
+    try:
+        for bsync in bsyncs:
+            bsync.load_buffer()
+        i = 0
+        while True:
+            bsync = bsyncs[i % len(bsyncs)]
+            bsync.acquire_read()
+            buff = bsync.shmbuffer
+            buff.load_size()
+            data = buff.snapshot()
+            seen.append((data[0], len(data)))
+            full = len(data) == buff.size
+            data.release()
+            bsync.release_read()
+            if not full:
+                break
+            i += 1
+    except Exception as e:
+        errors.put(f"consumer: {e!r}")
+    finally:
+        for bsync in bsyncs:
+            bsync.close()
+    results.put(seen)
+
+
+@unittest.skipUnless(SHMBarrier.supported(), "process-shared semaphores are not supported")
+class TestSHMBarrier(unittest.TestCase):
+
+    def run_barrier(self, parties: int, rounds: int):
+        barrier = SHMBarrier(parties=parties, create=True)
+        slots = Array('q', parties, lock=False)
+        errors = Queue()
+        procs = [Process(target=barrier_worker, args=(barrier.name, i, rounds, slots, errors)) for i in range(parties)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join(60)
+        barrier.close()
+        barrier.unlink()
+        self.assertTrue(all(p.exitcode == 0 for p in procs))
+        self.assertTrue(errors.empty(), errors.get() if not errors.empty() else None)
+
+    def test_flat_barrier(self):
+        self.run_barrier(parties=4, rounds=200)
+
+    def test_tree_barrier(self):
+        self.run_barrier(parties=SHMBarrier.TREE_THRESHOLD + 2, rounds=100)
+
+
+@unittest.skipUnless(SHMBarrier.supported(), "process-shared semaphores are not supported")
+class TestSHMFanoutBuffer(unittest.TestCase):
+
+    def test_snapshot(self):
+        buff = SHMFanoutBuffer(size=64, create=True, max_parties=2)
+        buff.save_bytes(b"hello world")
+        other = SHMFanoutBuffer(size=0, name=buff.name, create=False)
+        self.assertEqual(bytes(other.load_bytes()), b"hello world")
+        self.assertEqual(other.snapshot_len, 11)
+        out = bytearray(16)
+        self.assertEqual(other.snapshot_into(out), 11)
+        self.assertEqual(bytes(out[:11]), b"hello world")
+        other.close()
+        buff.close()
+        buff.unlink()
+
+    def test_handoff(self):
+        chunk_size = 4096
+        chunks = 50
+        consumers = 3
+        buffers = [SHMFanoutBuffer(size=chunk_size, create=True, max_parties=consumers + 1) for _ in range(2)]
+        names = [b.name for b in buffers]
+        expected = [(i & 0xFF, chunk_size) for i in range(chunks - 1)] + [((chunks - 1) & 0xFF, 1)]
+
+        # the same buffers are reused after a reset, as SHMHasher does for each file
+        for parties in (consumers + 1, consumers):
+            for b in buffers:
+                b.reset_barrier(parties)
+            results = Queue()
+            errors = Queue()
+            procs = [Process(target=producer_worker, args=(names, chunks, chunk_size, errors))]
+            procs += [Process(target=consumer_worker, args=(names, results, errors)) for _ in range(parties - 1)]
+            for p in procs:
+                p.start()
+            seen = [results.get(timeout=60) for _ in range(parties - 1)]
+            for p in procs:
+                p.join(60)
+            self.assertTrue(errors.empty(), errors.get() if not errors.empty() else None)
+            for s in seen:
+                self.assertEqual(s, expected)
+
+        for b in buffers:
+            b.close()
+            b.unlink()
+
+
+class TestSHMHasher(unittest.TestCase):
+    _temp_dir: TemporaryDirectory
+    temp_dir: str
+    buffer_size = 64 * 1024
+
+    @classmethod
+    def setUpClass(cls):
+        cls.hasher = SHMHasher(buffer_size=cls.buffer_size, max_workers=4)
+        return super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        del cls.hasher
+        return super().tearDownClass()
+
+    def setUp(self):
+        self._temp_dir = TemporaryDirectory(dir='/dev/shm')
+        self.temp_dir = self._temp_dir.name
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+        self._temp_dir = None
+
+    def check_file(self, size: int):
+        fpath = Path(self.temp_dir) / f"data_{size}.bin"
+        data = bytes(i * 7 & 0xFF for i in range(size))
+        fpath.write_bytes(data)
+        report = self.hasher.hash_file(str(fpath), 'md5', 'sha256', file_magic=False, file_mime=False)
+        self.assertEqual(report['size'], size)
+        self.assertEqual(report['md5'], hashlib.md5(data).hexdigest())
+        self.assertEqual(report['sha256'], hashlib.sha256(data).hexdigest())
+
+    def test_empty_file(self):
+        self.check_file(0)
+
+    def test_buffer_multiple(self):
+        self.check_file(self.buffer_size * 3)
+
+    def test_multi_chunk(self):
+        self.check_file(self.buffer_size * 5 + 123)